@@ -1,6 +1,60 @@
+import threading
+
+import numpy as np
+import polars as pl
 import streamlit as st
-import pandas as pd
-from main import simulate_retirement_investable
+
+# Number of market returns evaluated for the sensitivity chart.
+SWEEP_POINTS = 50
+
+# Streamlit runs each session on its own thread; simulate_batch must not be entered
+# concurrently (Numba's workqueue threading layer aborts the process if it is).
+_BATCH_LOCK = threading.Lock()
+
+@st.cache_data(max_entries=128)
+def _run_sim(lump_sum, pension, current_age, age_of_death, other_income_social, other_income_tax, market_return):
+    """Run the simulation, memoized on its inputs across reruns."""
+    # Imported here so the initial page render does not load the compiled core.
+    from main import simulate_retirement_investable
+    return pl.DataFrame(simulate_retirement_investable(
+        lump_sum=lump_sum,
+        pension=pension,
+        current_age=current_age,
+        age_of_death=age_of_death,
+        other_income_social=other_income_social,
+        other_income_tax=other_income_tax,
+        market_return=market_return
+    ))
+
+@st.cache_data(max_entries=128)
+def _run_sweep(lump_sum, pension, current_age, age_of_death, other_income_social, other_income_tax, market_return_range):
+    """Final capital for evenly spaced market returns (in %) across market_return_range."""
+    from main import HEADER, simulate_batch
+    market_returns_percentage = np.linspace(*market_return_range, SWEEP_POINTS)
+    num_scenarios = len(market_returns_percentage)
+    with _BATCH_LOCK:
+        out = simulate_batch(
+            np.full(num_scenarios, float(lump_sum)),
+            np.full(num_scenarios, float(pension)),
+            int(current_age),
+            int(age_of_death),
+            np.full(num_scenarios, float(other_income_social)),
+            np.full(num_scenarios, float(other_income_tax)),
+            market_returns_percentage / 100
+        )
+    capital_end = out[:, HEADER[2:].index("Capital End"), -1]
+    return pl.DataFrame({
+        "Annual Market Return (%)": market_returns_percentage,
+        "Final Capital (€)": np.round(capital_end, 2),
+    })
+
+@st.cache_resource
+def _warm_up_core():
+    """Load the compiled single-run simulation core once per server process."""
+    # Importing main compiles german_income_tax and _simulate_core, or loads them from
+    # the on-disk cache. The parallel simulate_batch kernel is compiled lazily on the
+    # first sweep and is deliberately not warmed up here.
+    import main  # noqa: F401
 
 st.title("Retirement Investable Capital Simulation")
 
@@ -33,6 +87,7 @@ st.markdown(
       > **Note:** The social security and income tax income figures are **not additive**. They serve as separate bases for their respective calculations.
     
     - **Annual Market Return (%):** Expected annual return rate on the invested capital.
+    - **Market Return Range (%):** Range of annual market returns for the sensitivity chart of the final capital.
     """
 )
 
@@ -100,19 +155,42 @@ market_return_percentage = st.sidebar.number_input(
 )
 market_return = market_return_percentage / 100  # Convert percentage to fraction
 
-if st.sidebar.button("Run Simulation"):
-    if age_of_death <= current_age:
-        st.error("Age of Death must be greater than Current Age.")
-    else:
-        results = simulate_retirement_investable(
-            lump_sum=lump_sum,
-            pension=pension,
-            current_age=current_age,
-            age_of_death=age_of_death,
-            other_income_social=other_income_social,
-            other_income_tax=other_income_tax,
-            market_return=market_return
-        )
-        df = pd.DataFrame(results)
-        st.write("### Simulation Results")
-        st.dataframe(df)
+market_return_range = st.sidebar.slider(
+    "Market Return Range (%)",
+    min_value=0.0,
+    max_value=15.0,
+    value=(0.0, 6.0),
+    step=0.1,
+    help="Range of annual market returns for the sensitivity chart of the final capital."
+)
+
+@st.fragment
+def _results_pane(params, market_return_range):
+    """Run and display the simulation; reruns on its own when the button is pressed."""
+    if st.button("Run Simulation"):
+        if params["age_of_death"] <= params["current_age"]:
+            st.error("Age of Death must be greater than Current Age.")
+        else:
+            results = _run_sim(**params)
+            st.write("### Simulation Results")
+            st.dataframe(results)
+
+            sweep_params = {k: v for k, v in params.items() if k != "market_return"}
+            sweep = _run_sweep(market_return_range=market_return_range, **sweep_params)
+            st.write("### Sensitivity to Market Return")
+            st.line_chart(sweep, x="Annual Market Return (%)", y="Final Capital (€)")
+
+_results_pane(dict(
+    lump_sum=lump_sum,
+    pension=pension,
+    current_age=current_age,
+    age_of_death=age_of_death,
+    other_income_social=other_income_social,
+    other_income_tax=other_income_tax,
+    market_return=market_return
+), market_return_range)
+
+# Warm up after the page has rendered. On a cold start without a populated Numba
+# cache this still blocks the first script run for the core's compile (a few
+# seconds); button presses during that time wait for it to finish.
+_warm_up_core()
@@ -25,6 +25,16 @@ Output: A table with fixed-width columns showing:
     Gross Investment Return, Investment Tax, Net Investment Return, Capital End
 """
 
+import numpy as np
+from numba import config, njit, prange
+
+# Use Numba's built-in workqueue threading layer for the parallel batch kernel rather
+# than whichever layer happens to be installed: TBB keeps the interpreter from
+# exiting once a parallel kernel was loaded outside the main thread (as Streamlit
+# does). workqueue is not threadsafe, so concurrent simulate_batch calls must be
+# serialized by the caller.
+config.THREADING_LAYER = "workqueue"
+
 # ----- CONFIGURATION CONSTANTS -----
 START_YEAR = 2025
 
@@ -37,49 +47,236 @@ SOCIAL_SECURITY_THRESHOLD = 66150  # Upper income threshold for social security
 # Effective rate = 25% * (1 + 0.055) ≈ 26.38%
 CAPITAL_GAINS_TAX_RATE = 0.2638
 
+# Output table columns, in order.
+HEADER = [
+    "Calendar Year", "Age", "Capital Start", "Lump Sum Gross", "Lump Sum Tax",
+    "Lump Sum SS", "Pension Gross", "Pension Tax", "Pension SS", "Net Flow",
+    "Gross Investment Return", "Investment Tax", "Net Investment Return", "Capital End"
+]
+
 # ----- TAX FUNCTIONS (Simplified Examples) -----
+# Income tax brackets: upper bound of each bracket (inclusive), and per bracket the
+# coefficients (lower, scale, a, b, c) of tax = (a * y + b) * y + c with
+# y = (income - lower) / scale.
+_TAX_BREAKS = np.array([11784.0, 17005.0, 66760.0, 277825.0, np.inf])
+_TAX_COEFS = np.array([
+    (0.0, 1.0, 0.0, 0.0, 0.0),
+    (11784.0, 10000.0, 954.8, 1400.0, 0.0),
+    (17005.0, 10000.0, 181.19, 2397.0, 991.21),
+    (0.0, 1.0, 0.0, 0.42, -10636.31),
+    (0.0, 1.0, 0.0, 0.45, -18971.06),
+])
+
+@njit("float64(float64)", cache=True)
 def german_income_tax(income):
     """
-    Calculate German income tax using official formulas from §32a EStG.
-    (Coefficients here are those for 2020; adjust thresholds/coefs for 2025 if available.)
-    
-    - No tax for income up to 9,744€
-    - For income between 9,745€ and 14,753€:
-         y = (income - 9,744) / 10,000
-         tax = (995.21 * y + 1400) * y
-    - For income between 14,754€ and 57,918€:
-         z = (income - 14,753) / 10,000
-         tax = (208.85 * z + 2397) * z + 950.96
-    - For income between 57,919€ and 274,612€:
-         tax = 0.42 * income - 9,136.63
-    - For income above 274,612€:
-         tax = 0.45 * income - 17,374.99
+    Calculate German income tax using the piecewise formulas from §32a EStG.
+    The bracket thresholds and coefficients are defined in _TAX_BREAKS / _TAX_COEFS.
     """
-    if income <= 11784:
-        return 0.0
-    elif income <= 17005:
-        y = (income - 11784) / 10000.0
-        return (954.8 * y + 1400) * y
-    elif income <= 66760:
-        z = (income - 17005) / 10000.0
-        return (181.19 * z + 2397) * z + 991.21
-    elif income <= 277825:
-        return 0.42 * income - 10636.31
-    else:
-        return 0.45 * income - 18971.06
-
-def lump_sum_tax_fünftel(lump_sum, base_income):
+    # Clamp so that NaN (sorted past the last break) stays inside the table.
+    idx = min(np.searchsorted(_TAX_BREAKS, income), len(_TAX_COEFS) - 1)
+    y = (income - _TAX_COEFS[idx, 0]) / _TAX_COEFS[idx, 1]
+    a = _TAX_COEFS[idx, 2]
+    b = _TAX_COEFS[idx, 3]
+    c = _TAX_COEFS[idx, 4]
+    # Skip zero coefficients so that an infinite income does not give 0 * inf = NaN.
+    if a == 0.0:
+        if b == 0.0:
+            return c
+        return b * y + c
+    return (a * y + b) * y + c
+
+@njit("float64[:](float64[:])", cache=True)
+def german_income_tax_vec(incomes):
     """
-    Calculate the lump sum tax using the Fünftelregelung.
-    The lump sum is divided into 5 equal parts. The tax on one-fifth of the lump sum,
-    when added to the base income, is computed. The incremental tax (difference) is
-    multiplied by 5.
+    Vectorized german_income_tax: evaluate the income tax for an array of incomes
+    in one pass over the bracket table.
     """
-    base_tax = german_income_tax(base_income)
-    tax_with_fraction = german_income_tax(base_income + lump_sum / 5)
-    return 5 * (tax_with_fraction - base_tax)
+    idx = np.minimum(np.searchsorted(_TAX_BREAKS, incomes), len(_TAX_COEFS) - 1)
+    coefs = _TAX_COEFS[idx]
+    y = (incomes - coefs[:, 0]) / coefs[:, 1]
+    a = coefs[:, 2]
+    b = coefs[:, 3]
+    c = coefs[:, 4]
+    # Skip zero coefficients so that an infinite income does not give 0 * inf = NaN.
+    linear = np.where(b == 0.0, c, b * y + c)
+    return np.where(a == 0.0, linear, (a * y + b) * y + c)
 
 # ----- SIMULATION FUNCTION (Investable Capital Only) -----
+@njit("float64[:](float64, float64[:])", cache=True)
+def _geometric_sums(growth_rate, terms):
+    """
+    Sum g^1 + g^2 + ... + g^m for each m in terms, with g = 1 + growth_rate.
+    Uses expm1/log1p so the result stays accurate for growth rates near zero.
+    """
+    if growth_rate == 0.0:
+        return terms.copy()
+    growth = 1 + growth_rate
+    if growth <= 0.0:
+        # log1p is undefined here (returns NaN), so sum the powers directly.
+        max_terms = int(terms.max()) if terms.size > 0 else 0
+        partial_sums = np.zeros(max_terms + 1)
+        for m in range(1, max_terms + 1):
+            partial_sums[m] = partial_sums[m - 1] + growth ** m
+        return partial_sums[terms.astype(np.int64)]
+    return (1 + growth_rate) * np.expm1(terms * np.log1p(growth_rate)) / growth_rate
+
+# Number of monetary output columns computed by the core (HEADER without
+# Calendar Year and Age).
+_NUM_CORE_COLUMNS = len(HEADER) - 2
+
+# Explicit signature so the core is compiled at import time instead of on the first
+# call. This only moves the JIT cost: a cold start still compiles during import, and
+# only a populated on-disk cache (cache=True) avoids it.
+_SIMULATE_CORE_SIGNATURE = (
+    "void(float64[:, :], float64, float64, int64, int64, float64, float64, float64)"
+)
+
+@njit(_SIMULATE_CORE_SIGNATURE, cache=True)
+def _simulate_core(
+    out,
+    lump_sum,
+    pension,
+    current_age,
+    age_of_death,
+    other_income_social,
+    other_income_tax,
+    market_return
+):
+    """
+    Compiled numeric core of simulate_retirement_investable. Fills out, of shape
+    (_NUM_CORE_COLUMNS, num_years), with one row per monetary output column in the
+    order of HEADER (i.e. without Calendar Year and Age).
+    """
+    num_years = max(age_of_death - current_age, 0)
+    
+    # Define the base incomes from the "other" sources.
+    base_regular = other_income_tax + other_income_social  # for income tax
+    base_ss = other_income_social  # for social security
+    
+    # For social security, the lump sum is "spread" over 10 years.
+    lump_share = lump_sum / 10  # each year's notional addition for social security purposes
+
+    # Income tax and capped social security base at each income level needed
+    # below, evaluated once.
+    tax_base = german_income_tax(base_regular)
+    tax_base_pen = german_income_tax(base_regular + pension)
+    tax_base_pen_lumpfifth = german_income_tax(base_regular + pension + lump_sum / 5)
+    ss_base = min(base_ss, SOCIAL_SECURITY_THRESHOLD)
+    ss_base_pen = min(base_ss + pension, SOCIAL_SECURITY_THRESHOLD)
+    ss_base_pen_lump = min(base_ss + pension + lump_share, SOCIAL_SECURITY_THRESHOLD)
+    
+    # --- Pension Calculations (These are constant every year) ---
+    # Incremental income tax due to pension:
+    pension_tax = tax_base_pen - tax_base
+    # Incremental social security for pension:
+    pension_ss = (ss_base_pen - ss_base) * SOCIAL_SECURITY_RATE
+    net_pension = pension - (pension_tax + pension_ss)
+    
+    # --- Lump Sum Calculations (Only in year 0) ---
+    # For tax, the lump sum is added on top of base_regular + pension using the
+    # Fünftelregelung: the incremental tax on one-fifth of the lump sum, times 5.
+    lump_tax = 5 * (tax_base_pen_lumpfifth - tax_base_pen)
+    net_lump = lump_sum - lump_tax
+    # Yearly social security on the lump share, on top of base_ss + pension.
+    lump_ss_year = (ss_base_pen_lump - ss_base_pen) * SOCIAL_SECURITY_RATE
+
+    # --- Year-by-year cash flows ---
+    years = np.arange(num_years)
+    # Year 0: both lump sum (gross and its tax are realized) and pension.
+    is_year0 = (years == 0).astype(np.float64)
+    # Years 0 to 9: the lump sum's social security payment is spread over 10 years.
+    has_lump_ss = (years < 10).astype(np.float64)
+
+    lump_sum_grosses = lump_sum * is_year0
+    lump_sum_taxes = lump_tax * is_year0
+    lump_sum_sss = lump_ss_year * has_lump_ss
+    pension_grosses = np.full(num_years, pension)
+    pension_taxes = np.full(num_years, pension_tax)
+    pension_sss = np.full(num_years, pension_ss)
+    # Net cash flow: net lump (after tax) plus net pension, then pay this year's lump SS.
+    net_flows = net_pension + net_lump * is_year0 - lump_sum_sss
+
+    # Per-euro investment return and capital gains tax, invariant across years.
+    gross_factor = market_return
+    tax_factor = market_return * CAPITAL_GAINS_TAX_RATE
+
+    # --- Capital Development ---
+    # Each year the net flow is added and the new basis grows by the post-tax rate,
+    # so Capital End_n = sum_{k<=n} net_flow_k * g^(n-k+1). The net flow only takes
+    # three values (year 0, years 1 to 9, year 10 onward), which turns the sum into
+    # three geometric series.
+    growth_rate = gross_factor - tax_factor
+    flow_first = net_pension + net_lump - lump_ss_year
+    flow_lump_ss = net_pension - lump_ss_year
+    flow_pension_only = net_pension
+    pension_only_terms = np.maximum(years - 9, 0).astype(np.float64)
+    sums_all = _geometric_sums(growth_rate, years.astype(np.float64))
+    sums_pension_only = _geometric_sums(growth_rate, pension_only_terms)
+    capital_ends = (flow_first * (1 + growth_rate) ** (years + 1.0)
+                    + flow_lump_ss * (sums_all - sums_pension_only)
+                    + flow_pension_only * sums_pension_only)
+    capital_starts = np.zeros(num_years)
+    capital_starts[1:] = capital_ends[:-1]
+
+    # --- Investment Return Calculation ---
+    # The net cash flow is added to the existing capital before returns accrue.
+    new_basis = capital_starts + net_flows
+    gross_investment_returns = new_basis * gross_factor
+    investment_taxes = new_basis * tax_factor
+    net_investment_returns = gross_investment_returns - investment_taxes
+
+    out[0, :] = capital_starts
+    out[1, :] = lump_sum_grosses
+    out[2, :] = lump_sum_taxes
+    out[3, :] = lump_sum_sss
+    out[4, :] = pension_grosses
+    out[5, :] = pension_taxes
+    out[6, :] = pension_sss
+    out[7, :] = net_flows
+    out[8, :] = gross_investment_returns
+    out[9, :] = investment_taxes
+    out[10, :] = net_investment_returns
+    out[11, :] = capital_ends
+
+# Compiled lazily on the first call, so importing main does not pay for (or load)
+# the parallel kernel when no batch is run.
+@njit(parallel=True, cache=True)
+def simulate_batch(
+    lump_sums,
+    pensions,
+    current_age,
+    age_of_death,
+    other_incomes_social,
+    other_incomes_tax,
+    market_returns
+):
+    """
+    Run one simulation per scenario in parallel, e.g. for a sweep over market returns.
+    Scenario i uses the i-th entry of each input array; all scenarios share the same
+    age range.
+
+    Returns an array of shape (scenarios, _NUM_CORE_COLUMNS, years) holding the
+    unrounded monetary columns in the order of HEADER[2:].
+
+    Not safe to call from several threads at once (see THREADING_LAYER above);
+    callers running in threads must serialize calls.
+    """
+    num_scenarios = market_returns.shape[0]
+    out = np.empty((num_scenarios, _NUM_CORE_COLUMNS, max(age_of_death - current_age, 0)))
+    for i in prange(num_scenarios):
+        _simulate_core(
+            out[i],
+            lump_sums[i],
+            pensions[i],
+            current_age,
+            age_of_death,
+            other_incomes_social[i],
+            other_incomes_tax[i],
+            market_returns[i]
+        )
+    return out
+
 def simulate_retirement_investable(
     lump_sum: float,
     pension: float,
@@ -95,106 +292,36 @@ def simulate_retirement_investable(
     but are excluded from the investable capital.
     
     Now, the annual market returns are taxed at the effective capital gains tax rate.
+
+    Returns a dict mapping each HEADER column to a NumPy array with one entry per year.
     """
-    num_years = age_of_death - current_age
-    capital = 0.0  # Starting investable capital
-    
-    # Define the base incomes from the "other" sources.
-    base_regular = other_income_tax + other_income_social  # for income tax
-    base_ss = other_income_social  # for social security
-    
-    # --- Pension Calculations (These are constant every year) ---
-    # Incremental income tax due to pension:
-    pension_tax = german_income_tax(base_regular + pension) - german_income_tax(base_regular)
-    # Incremental social security for pension:
-    pension_ss = (min(base_ss + pension, SOCIAL_SECURITY_THRESHOLD) -
-                  min(base_ss, SOCIAL_SECURITY_THRESHOLD)) * SOCIAL_SECURITY_RATE
-    net_pension = pension - (pension_tax + pension_ss)
-    
-    # --- Lump Sum Calculations (Only in year 0) ---
-    # For tax, the lump sum is added on top of base_regular + pension.
-    lump_tax = lump_sum_tax_fünftel(lump_sum, base_regular + pension)
-    net_lump = lump_sum - lump_tax
-    # For social security, the lump sum is "spread" over 10 years.
-    lump_share = lump_sum / 10  # each year's notional addition for social security purposes
-    lump_ss_year = (min(base_ss + pension + lump_share, SOCIAL_SECURITY_THRESHOLD) -
-                    min(base_ss + pension, SOCIAL_SECURITY_THRESHOLD)) * SOCIAL_SECURITY_RATE
-
-    results = []
-    for year_index in range(num_years):
-        cal_year = START_YEAR + year_index
-        age = current_age + year_index
-        capital_start = capital
-
-        # Determine cash flows for this year:
-        if year_index == 0:
-            # Year 0: both lump sum (gross and its tax are realized) and pension.
-            lump_sum_gross = lump_sum
-            lump_sum_tax = lump_tax
-            # Lump sum SS is paid over 10 years (first year payment):
-            lump_sum_ss = lump_ss_year
-            pension_gross = pension
-            pension_tax_value = pension_tax
-            pension_ss_value = pension_ss
-            # Net cash flow: net lump (after tax) plus net pension, then pay this year's lump SS.
-            net_flow = net_lump + net_pension - lump_sum_ss
-        elif year_index < 10:
-            # Years 1 to 9: Only the pension is received investably,
-            # but the lump sum's social security payment continues.
-            lump_sum_gross = 0.0
-            lump_sum_tax = 0.0
-            lump_sum_ss = lump_ss_year
-            pension_gross = pension
-            pension_tax_value = pension_tax
-            pension_ss_value = pension_ss
-            net_flow = net_pension - lump_sum_ss
-        else:
-            # From year 10 onward, only pension flows.
-            lump_sum_gross = 0.0
-            lump_sum_tax = 0.0
-            lump_sum_ss = 0.0
-            pension_gross = pension
-            pension_tax_value = pension_tax
-            pension_ss_value = pension_ss
-            net_flow = net_pension
-
-        # --- Investment Return Calculation ---
-        # First, add the net cash flow to the existing capital.
-        new_basis = capital_start + net_flow
-        # Compute gross investment return.
-        gross_investment_return = new_basis * market_return
-        # Compute capital gains tax on the investment return.
-        investment_tax = gross_investment_return * CAPITAL_GAINS_TAX_RATE
-        # Net investment return after tax.
-        net_investment_return = gross_investment_return - investment_tax
-
-        # Update capital at end of year.
-        post_investment = new_basis + net_investment_return
-
-        results.append({
-            "Calendar Year": cal_year,
-            "Age": age,
-            "Capital Start": round(capital_start, 2),
-            "Lump Sum Gross": round(lump_sum_gross, 2),
-            "Lump Sum Tax": round(lump_sum_tax, 2),
-            "Lump Sum SS": round(lump_sum_ss, 2),
-            "Pension Gross": round(pension_gross, 2),
-            "Pension Tax": round(pension_tax_value, 2),
-            "Pension SS": round(pension_ss_value, 2),
-            "Net Flow": round(net_flow, 2),
-            "Gross Investment Return": round(gross_investment_return, 2),
-            "Investment Tax": round(investment_tax, 2),
-            "Net Investment Return": round(net_investment_return, 2),
-            "Capital End": round(post_investment, 2)
-        })
-
-        # Update capital for next year:
-        capital = post_investment
-
-    return results
+    # No years to simulate if age_of_death <= current_age; the result is then empty.
+    num_years = max(age_of_death - current_age, 0)
+    arrays = np.empty((_NUM_CORE_COLUMNS, num_years))
+    # Cast the inputs to match the compiled signature of the core.
+    _simulate_core(
+        arrays,
+        float(lump_sum),
+        float(pension),
+        int(current_age),
+        int(age_of_death),
+        float(other_income_social),
+        float(other_income_tax),
+        float(market_return)
+    )
+    np.round(arrays, 2, out=arrays)
+    # Monetary columns stay float64: float32 cannot hold cent values above ~131,072 €.
+    cols = {
+        "Calendar Year": np.arange(START_YEAR, START_YEAR + num_years, dtype=np.int32),
+        "Age": np.arange(current_age, age_of_death, dtype=np.int32),
+    }
+    cols.update(zip(HEADER[2:], arrays))
+    return cols
 
 # ----- EXAMPLE USAGE -----
 if __name__ == "__main__":
+    import polars as pl
+
     # Example input parameters (adjust these as needed):
     lump_sum = 0         # one-time lump sum (in €)
     pension = 12000           # yearly pension (in €)
@@ -214,22 +341,15 @@ if __name__ == "__main__":
         market_return
     )
     
-    # Define header for output:
-    header = [
-        "Calendar Year", "Age", "Capital Start", "Lump Sum Gross", "Lump Sum Tax",
-        "Lump Sum SS", "Pension Gross", "Pension Tax", "Pension SS", "Net Flow",
-        "Gross Investment Return", "Investment Tax", "Net Investment Return", "Capital End"
-    ]
-    
-    # Set a fixed column width (adjust as needed)
-    col_width = 24
-
-    # Print header row with fixed-width columns:
-    header_line = "".join(f"{col:<{col_width}}" for col in header)
-    print(header_line)
-    print("-" * len(header_line))
-    
-    # Print each row with fixed-width columns:
-    for row in sim_results:
-        row_line = "".join(f"{str(row[col]):<{col_width}}" for col in header)
-        print(row_line)
+    # Print the table with fixed-width columns:
+    with pl.Config(
+        tbl_rows=-1,
+        tbl_cols=-1,
+        tbl_width_chars=1000,
+        float_precision=2,
+        tbl_formatting="NOTHING",
+        tbl_hide_dataframe_shape=True,
+        tbl_hide_column_data_types=True,
+        tbl_cell_numeric_alignment="RIGHT"
+    ):
+        print(pl.DataFrame(sim_results))